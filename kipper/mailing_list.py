@@ -1,23 +1,51 @@
 import os
 import re
+import json
+import logging
+import hashlib
+import shutil
 import datetime as dt
 
-from typing import Dict, List, Tuple, Optional, Union, Set, Any
+from typing import Dict, List, Tuple, Optional, Union, Set, Any, Iterable, NamedTuple
 from pathlib import Path
 from enum import Enum
+from itertools import repeat
+from functools import lru_cache
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 
 from mailbox import mbox
+from email import message_from_bytes
+from email.utils import formatdate, parsedate_to_datetime
 from email.message import Message
-from pandas import DataFrame, concat, to_datetime, read_csv
+from pandas import (
+    DataFrame,
+    Series,
+    CategoricalDtype,
+    concat,
+    to_datetime,
+    read_csv,
+)
 
 import requests
 
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
-KIP_PATTERN: re.Pattern = re.compile(r"KIP-(?P<kip>\d+)", re.IGNORECASE)
+LOG: logging.Logger = logging.getLogger(__name__)
+
+KIP_PATTERN: re.Pattern = re.compile(r"KIP-(?P<kip>\d+)", re.IGNORECASE | re.ASCII)
+VOTE_PATTERN: re.Pattern = re.compile(r" (?:\+1|-1|0) ")
+KIP_BYTES_PATTERN: re.Pattern = re.compile(rb"KIP-\d", re.IGNORECASE)
+HTML_TAG_PATTERN: re.Pattern = re.compile(r"</?(?:html|div)>")
 BASE_URL: str = "https://lists.apache.org/api/mbox.lua"
 DOMAIN: str = "kafka.apache.org"
-MAIL_DATE_FORMAT = "%a, %d %b %Y %H:%M:%S %z"
-MAIL_DATE_FORMAT_ZONE = "%a, %d %b %Y %H:%M:%S %z (%Z)"
+# Some mail clients append the time zone name as a comment after the offset
+MAIL_DATE_ZONE_COMMENT: re.Pattern = re.compile(r"\s*\([^)]*\)\s*$")
+# Others write the offset after a zone name, e.g. GMT+01:00, which parsedate_to_datetime
+# would otherwise silently read as UTC
+MAIL_DATE_NAMED_OFFSET: re.Pattern = re.compile(
+    r"\s(?:GMT|UTC)(?P<sign>[+-])(?P<hours>\d{1,2})(?::?(?P<minutes>\d{2}))?$"
+)
 KIP_MENTION_COLUMNS = [
     "kip",
     "mention_type",
@@ -30,6 +58,9 @@ KIP_MENTION_COLUMNS = [
 ]
 CACHE_DIR = "cache"
 CACHE_SUFFIX = ".cache.csv"
+HASH_SUFFIX = ".hash"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_WORKERS = 4
 
 
 class KIPMentionType(Enum):
@@ -41,15 +72,47 @@ class KIPMentionType(Enum):
     BODY = "body"
 
 
+# The mention type column only ever holds one of the KIPMentionType values so it is
+# stored as a categorical, which is smaller and faster to group by than strings.
+MENTION_TYPE_DTYPE: CategoricalDtype = CategoricalDtype(
+    [mention_type.value for mention_type in KIPMentionType]
+)
+
+
+KIP_MENTION_TYPES: Dict[str, KIPMentionType] = {
+    mention_type.value: mention_type for mention_type in KIPMentionType
+}
+
+
 def kmt_from_str(mention_type: str) -> KIPMentionType:
     """Finds the KIPMentionType enum value which matches the supplied string.
     Raises a ValueError if the supplied string doesn't match a mention type."""
 
-    for option in KIPMentionType:
-        if mention_type == option.value:
-            return option
+    try:
+        return KIP_MENTION_TYPES[mention_type]
+    except KeyError as key_err:
+        raise ValueError(f"{mention_type} is not a valid KIPMentionType") from key_err
+
+
+def create_session() -> requests.Session:
+    """Creates a requests session which keeps connections to the mail archive alive
+    so that each monthly download does not have to open a new connection and retries
+    requests which fail with a server error"""
+
+    session: requests.Session = requests.Session()
+    adapter: HTTPAdapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=DOWNLOAD_WORKERS,
+        max_retries=Retry(
+            total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]
+        ),
+    )
+    session.mount("https://", adapter)
 
-    raise ValueError(f"{mention_type} is not a valid KIPMentionType")
+    return session
+
+
+SESSION: requests.Session = create_session()
 
 
 def get_monthly_mbox_file(
@@ -59,7 +122,8 @@ def get_monthly_mbox_file(
     overwrite: bool = False,
     output_directory: Optional[str] = None,
 ) -> Path:
-    """Downloads the specified mbox archive file from the specified mailing list"""
+    """Downloads the specified mbox archive file from the specified mailing list. When
+    overwriting an existing file it is only re-downloaded if the archive has changed."""
 
     filename = f"{mailing_list}_{DOMAIN.replace('.','_')}-{year}-{month}.mbox"
 
@@ -69,14 +133,19 @@ def get_monthly_mbox_file(
     else:
         filepath = Path(output_directory, filename)
 
+    headers: Dict[str, str] = {}
     if filepath.exists():
         if not overwrite:
-            print(
-                f"Mbox file {filepath} already exists. Skipping download (set overwrite to True to re-download)."
+            LOG.info(
+                "Mbox file %s already exists. Skipping download (set overwrite to True to re-download).",
+                filepath,
             )
             return filepath
 
-        print(f"Overwritting existing mbox file: {filepath}")
+        LOG.info("Overwritting existing mbox file: %s", filepath)
+        # Ask the server to skip sending the archive if it hasn't changed since the
+        # existing copy was downloaded
+        headers["If-Modified-Since"] = formatdate(filepath.stat().st_mtime, usegmt=True)
 
     options: Dict[str, str] = {
         "list": mailing_list,
@@ -84,34 +153,33 @@ def get_monthly_mbox_file(
         "d": f"{year}-{month}",
     }
 
-    with requests.get(BASE_URL, params=options, stream=True) as response:
+    with SESSION.get(
+        BASE_URL, params=options, headers=headers, stream=True
+    ) as response:
+        if response.status_code == 304:
+            LOG.info(
+                "Mbox file %s is unchanged on the server. Keeping existing.", filepath
+            )
+            return filepath
+
         response.raise_for_status()
+        # Copy straight from the underlying stream, decoding any content encoding as
+        # iter_content would, so the chunk loop runs in C rather than in Python.
+        response.raw.decode_content = True
         with open(filepath, "wb") as mbox_file:
-            for chunk in response.iter_content(chunk_size=8192):
-                mbox_file.write(chunk)
+            shutil.copyfileobj(response.raw, mbox_file, DOWNLOAD_CHUNK_SIZE)
 
     return filepath
 
 
 def generate_month_list(now: dt.datetime, then: dt.datetime) -> List[Tuple[int, int]]:
-    """Generates a list of year-month strings spanning from then to now"""
-
-    month_list: List[Tuple[int, int]] = []
+    """Generates a list of (year, month) tuples spanning from then to now (inclusive)"""
 
-    year: int = then.year
-    month: int = then.month
-    finished: bool = False
+    # Count months from year 0 so that each month maps to a single index
+    start: int = then.year * 12 + then.month - 1
+    end: int = now.year * 12 + now.month - 1
 
-    while not finished:
-        month_list.append((year, month))
-        month = (month + 1) % 13
-        if month == 0:
-            year += 1
-            month = 1
-        if month > now.month and year >= now.year:
-            finished = True
-
-    return month_list
+    return [(index // 12, index % 12 + 1) for index in range(start, end + 1)]
 
 
 def get_multiple_mbox(
@@ -135,47 +203,65 @@ def get_multiple_mbox(
 
     month_list: List[Tuple[int, int]] = generate_month_list(now, then)
 
-    filepaths: List[Path] = []
-    for year, month in month_list:
-        print(f"Downloading {mailing_list} archive for {month}/{year}")
-        filepath = get_monthly_mbox_file(
-            mailing_list,
-            year,
-            month,
-            output_directory=output_directory,
-            overwrite=overwrite,
-        )
-        filepaths.append(filepath)
+    # Each month is written to its own file so the downloads can run concurrently
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        downloads: List[Future] = []
+        for year, month in month_list:
+            LOG.info("Downloading %s archive for %d/%d", mailing_list, month, year)
+            downloads.append(
+                executor.submit(
+                    get_monthly_mbox_file,
+                    mailing_list,
+                    year,
+                    month,
+                    output_directory=output_directory,
+                    overwrite=overwrite,
+                )
+            )
+
+        filepaths: List[Path] = [download.result() for download in downloads]
 
     return filepaths
 
 
-def parse_message_timestamp(date_str) -> Optional[dt.datetime]:
-    """Parses the message timestamp string and converts to a python datetime object.
-    If the string cannot be parsed then None is returned."""
+def parse_message_timestamp(date_header: Any) -> Optional[dt.datetime]:
+    """Parses the message's Date header and converts to a python datetime object.
+    If the header is missing or cannot be parsed then None is returned. Headers with
+    non-ASCII bytes are returned as email.header.Header instances, so the header is
+    converted to a string before being parsed."""
 
-    timestamp: Optional[dt.datetime] = None
+    if date_header is None:
+        LOG.debug("Message has no Date header")
+        return None
 
-    try:
-        timestamp = dt.datetime.strptime(date_str, MAIL_DATE_FORMAT)
-    except ValueError:
-        pass
-    else:
-        return timestamp
+    return parse_date_string(str(date_header))
 
-    try:
-        timestamp = dt.datetime.strptime(date_str, MAIL_DATE_FORMAT_ZONE)
-    except ValueError:
-        pass
-    else:
-        return timestamp
 
-    # If neither the main format or one with TZ string work, try stripping
-    # the TZ String as one last hail Mary.
+@lru_cache(maxsize=131072)
+def parse_date_string(date_str: str) -> Optional[dt.datetime]:
+    """Parses the date string and converts to a python datetime object. If the string
+    cannot be parsed then None is returned. Replies in busy threads often share a Date
+    header so the results, including failures, are cached."""
+
+    date_str = MAIL_DATE_ZONE_COMMENT.sub("", date_str)
+    date_str = MAIL_DATE_NAMED_OFFSET.sub(
+        lambda offset: " {sign}{hours:0>2}{minutes}".format(
+            sign=offset["sign"],
+            hours=offset["hours"],
+            minutes=offset["minutes"] or "00",
+        ),
+        date_str,
+    )
+
     try:
-        timestamp = dt.datetime.strptime(date_str.split(" (")[0], MAIL_DATE_FORMAT)
-    except ValueError:
-        print(f"Could not parse timestamp: {date_str}")
+        timestamp: dt.datetime = parsedate_to_datetime(date_str)
+    except (TypeError, ValueError):
+        LOG.debug("Could not parse timestamp: %s", date_str)
+        return None
+
+    # A -0000 offset is parsed as a naive datetime but still refers to UTC
+    if not timestamp.tzinfo:
+        timestamp = timestamp.replace(tzinfo=dt.timezone.utc)
 
     return timestamp
 
@@ -188,22 +274,22 @@ def extract_message_payload(msg: Message) -> List[str]:
 
     for message in msg.walk():
 
+        if message.is_multipart():
+            # Container parts only hold their sub-parts, which walk will visit next,
+            # so their payload would just be a copy of their first sub-part's.
+            continue
+
         temp_payload: Union[List[Message], str] = message.get_payload()
         if isinstance(temp_payload, list):
             payload: str = temp_payload[0].get_payload()
         elif isinstance(temp_payload, str):
             payload = message.get_payload()
         else:
-            err_msg: str = f"Expected payload to be list or str no {type(temp_payload)}"
-            print(err_msg)
-            raise ValueError(err_msg)
+            raise ValueError(
+                f"Expected payload to be list or str no {type(temp_payload)}"
+            )
 
-        if (
-            ("<html>" in payload)
-            or ("</html>" in payload)
-            or ("<div>" in payload)
-            or ("</div>" in payload)
-        ):
+        if HTML_TAG_PATTERN.search(payload):
             # Sometimes the message will contain an additional html copy of the
             # main message
             continue
@@ -216,15 +302,15 @@ def extract_message_payload(msg: Message) -> List[str]:
         valid_payloads.append(payload)
 
     # Sometimes there are multiple copies of the exact same message in a payload so
-    # we use a set to remove those.
-    valid_payloads_set: Set[str] = set(valid_payloads)
+    # we remove those, keeping the remaining payloads in the order they appear.
+    unique_payloads: List[str] = list(dict.fromkeys(valid_payloads))
 
-    if len(valid_payloads_set) > 1:
-        print(
-            f"Warning: more than 1 message ({len(valid_payloads)}) in the message payload"
+    if len(unique_payloads) > 1:
+        LOG.debug(
+            "More than 1 message (%d) in the message payload", len(valid_payloads)
         )
 
-    return list(valid_payloads_set)
+    return unique_payloads
 
 
 def parse_for_vote(payload: str) -> Optional[str]:
@@ -232,7 +318,16 @@ def parse_for_vote(payload: str) -> Optional[str]:
     with ">", and checks if the line contains a +1, 0 or -1 returning the appropriate
     vote string if it does. If no, non-reply, line contains a vote then None is returned."""
 
-    for line in payload.split("\n"):
+    # Rather than checking every line, jump straight to the lines which contain a
+    # possible vote and only inspect those.
+    position: int = 0
+    while vote_match := VOTE_PATTERN.search(payload, position):
+        line_start: int = payload.rfind("\n", 0, vote_match.start()) + 1
+        line_end: int = payload.find("\n", vote_match.end())
+        if line_end == -1:
+            line_end = len(payload)
+
+        line: str = payload[line_start:line_end]
         if ">" not in line[:10]:
             if " +1 " in line:
                 return "+1"
@@ -240,12 +335,66 @@ def parse_for_vote(payload: str) -> Optional[str]:
             if " -1 " in line:
                 return "-1"
 
-            if " 0 " in line:
-                return "0"
+            # The line matched the vote pattern so the only option left is a 0
+            return "0"
+
+        position = line_end
 
     return None
 
 
+class MessageDetails(NamedTuple):
+    """The details shared by every KIP mention found in a single message"""
+
+    message_id: int
+    mbox_year: int
+    mbox_month: int
+    timestamp: dt.datetime
+    sender: str
+
+
+class MentionCollector:
+    """Collects KIP mentions as lists of column values, so that a DataFrame can be
+    built directly from them without transposing a list of rows. Repeated mentions
+    are skipped."""
+
+    def __init__(self) -> None:
+        self.data: Dict[str, List[Any]] = {column: [] for column in KIP_MENTION_COLUMNS}
+        self.seen: Set[Tuple[int, str, int, Optional[str]]] = set()
+
+    def add(
+        self,
+        message: MessageDetails,
+        kip_id: int,
+        mention_type: KIPMentionType,
+        vote: Optional[str] = None,
+    ) -> None:
+        """Adds a single KIP mention from the supplied message, unless it has already
+        been added."""
+
+        # All mentions from the same message share the message details so only the
+        # fields below can distinguish a new mention from a repeated one.
+        mention_type_value: str = mention_type.value
+        mention: Tuple[int, str, int, Optional[str]] = (
+            kip_id,
+            mention_type_value,
+            message.message_id,
+            vote,
+        )
+        if mention in self.seen:
+            return
+        self.seen.add(mention)
+
+        self.data["kip"].append(kip_id)
+        self.data["mention_type"].append(mention_type_value)
+        self.data["message_id"].append(message.message_id)
+        self.data["mbox_year"].append(message.mbox_year)
+        self.data["mbox_month"].append(message.mbox_month)
+        self.data["timestamp"].append(message.timestamp)
+        self.data["from"].append(message.sender)
+        self.data["vote"].append(vote)
+
+
 def process_mbox_archive(filepath: Path) -> DataFrame:
     """Process the supplied mbox archive, harvest the KIP data and
     create a DataFrame containing each mention"""
@@ -256,131 +405,210 @@ def process_mbox_archive(filepath: Path) -> DataFrame:
     mbox_year: int = int(year_month[-2])
     mbox_month: int = int(year_month[-1])
 
-    data: List[List[Union[str, int, dt.datetime, None]]] = []
+    mentions: MentionCollector = MentionCollector()
 
-    for key, msg in mail_box.items():
+    # The mbox keeps its file open between reads, so make sure it is closed even if
+    # processing a message fails.
+    try:
+        for key in mail_box.iterkeys():
 
-        # TODO: Add debug logging
-        # print(f"Processing message: {key}")
+            # Every mention is found in the raw subject or payload text, so a message
+            # whose raw bytes do not contain a KIP reference cannot produce any rows
+            # and there is no need to parse it into a full message object.
+            raw_message: bytes = mail_box.get_bytes(key)
+            if not KIP_BYTES_PATTERN.search(raw_message):
+                continue
 
-        # TODO: Could there be multiple KIPs mentioned in a subject?
-        subject_kip_match: Optional[re.Match] = re.search(KIP_PATTERN, msg["subject"])
+            msg: Message = message_from_bytes(raw_message)
 
-        timestamp: Optional[dt.datetime] = parse_message_timestamp(msg["Date"])
-        if not timestamp:
-            print(f"Could not parse timestamp for message {key}")
-            continue
+            LOG.debug("Processing message: %s", key)
+
+            # Header lookups scan the message's header list so only read each one once
+            subject: str = str(msg["subject"] or "")
+            sender: str = str(msg["from"])
+
+            # TODO: Could there be multiple KIPs mentioned in a subject?
+            subject_kip_match: Optional[re.Match] = KIP_PATTERN.search(subject)
+
+            timestamp: Optional[dt.datetime] = parse_message_timestamp(msg["Date"])
+            if not timestamp:
+                LOG.debug("Could not parse timestamp for message %s", key)
+                continue
 
-        is_vote: bool = False
-
-        if subject_kip_match:
-            subject_kip_id: int = int(subject_kip_match.groupdict()["kip"])
-            data.append(
-                [
-                    subject_kip_id,
-                    KIPMentionType.SUBJECT.value,
-                    key,
-                    mbox_year,
-                    mbox_month,
-                    timestamp,
-                    str(msg["from"]),
-                    None,
-                ]
+            message: MessageDetails = MessageDetails(
+                key, mbox_year, mbox_month, timestamp, sender
             )
 
-            if "VOTE" in msg["subject"]:
-                is_vote = True
-
-            elif "DISCUSS" in msg["subject"]:
-                data.append(
-                    [
-                        subject_kip_id,
-                        KIPMentionType.DISCUSS.value,
-                        key,
-                        mbox_year,
-                        mbox_month,
-                        timestamp,
-                        str(msg["from"]),
-                        None,
-                    ]
-                )
+            is_vote: bool = False
 
-        try:
-            valid_payloads: List[str] = extract_message_payload(msg)
-        except ValueError:
-            print(f"Error processing payload for message {key} in file {filepath}")
-            continue
+            if subject_kip_match:
+                subject_kip_id: int = int(subject_kip_match.group("kip"))
+                mentions.add(message, subject_kip_id, KIPMentionType.SUBJECT)
 
-        if not valid_payloads:
-            continue
+                if "VOTE" in subject:
+                    is_vote = True
 
-        for payload in valid_payloads:
-
-            if is_vote:
-                vote_str: Optional[str] = parse_for_vote(payload)
-                data.append(
-                    [
-                        subject_kip_id,
-                        KIPMentionType.VOTE.value,
-                        key,
-                        mbox_year,
-                        mbox_month,
-                        timestamp,
-                        str(msg["from"]),
-                        vote_str,
-                    ]
-                )
+                elif "DISCUSS" in subject:
+                    mentions.add(message, subject_kip_id, KIPMentionType.DISCUSS)
 
             try:
-                body_matches: List[str] = re.findall(KIP_PATTERN, payload)
-            except TypeError:
-                print(f"Unable to parse payload of type {type(payload)}")
+                valid_payloads: List[str] = extract_message_payload(msg)
+            except ValueError:
+                LOG.warning(
+                    "Error processing payload for message %s in file %s", key, filepath
+                )
                 continue
 
-            if body_matches:
-                for body_kip_str in body_matches:
-                    body_kip_id: int = int(body_kip_str)
-                    data.append(
-                        [
-                            body_kip_id,
-                            KIPMentionType.BODY.value,
-                            key,
-                            mbox_year,
-                            mbox_month,
-                            timestamp,
-                            str(msg["from"]),
-                            None,
-                        ]
-                    )
-
-    output = DataFrame(data, columns=KIP_MENTION_COLUMNS)
-    output["timestamp"] = to_datetime(output["timestamp"], utc=True)
+            if not valid_payloads:
+                continue
 
-    return output.drop_duplicates()
+            for payload in valid_payloads:
 
+                if is_vote:
+                    vote_str: Optional[str] = parse_for_vote(payload)
+                    mentions.add(message, subject_kip_id, KIPMentionType.VOTE, vote_str)
 
-def vote_converter(vote: Optional[str]) -> Optional[str]:
-    """Converter function for the vote column of the mbox cache dataframe"""
+                try:
+                    body_matches: List[str] = KIP_PATTERN.findall(payload)
+                except TypeError:
+                    LOG.debug("Unable to parse payload of type %s", type(payload))
+                    continue
 
-    if vote != "":
-        vote_num: float = float(vote)
-        if vote_num >= 1.0:
-            return "+1"
+                # Replies often quote the same KIP many times so each distinct id is
+                # only added once per payload, keeping the order they first appear.
+                body_kip_ids: Dict[int, None] = dict.fromkeys(map(int, body_matches))
+                for body_kip_id in body_kip_ids:
+                    mentions.add(message, body_kip_id, KIPMentionType.BODY)
+    finally:
+        mail_box.close()
 
-        if vote_num <= -1.0:
-            return "-1"
+    output = DataFrame(mentions.data)
+    output["timestamp"] = to_datetime(output["timestamp"], utc=True)
+    output["mention_type"] = output["mention_type"].astype(MENTION_TYPE_DTYPE)
 
-        return "0"
+    return output
 
-    return None
+
+def convert_votes(votes: Series) -> Series:
+    """Converts the numeric vote column read from an mbox cache file back into the
+    vote strings ("+1", "0" and "-1"). Missing votes are converted to None."""
+
+    output: Series = Series(None, index=votes.index, dtype=object)
+    output[votes.notna()] = "0"
+    output[votes >= 1.0] = "+1"
+    output[votes <= -1.0] = "-1"
+
+    return output
 
 
 def load_mbox_cache_file(cache_file: Path) -> DataFrame:
     """Loads the pre-processed mbox cache file and applies the relevant type converters"""
 
+    # The votes are read as floats by the CSV parser and converted in one pass
+    # afterwards, rather than calling a converter function for every row.
     file_data: DataFrame = read_csv(
-        cache_file, converters={"vote": vote_converter}, parse_dates=["timestamp"]
+        cache_file,
+        dtype={"mention_type": MENTION_TYPE_DTYPE, "vote": float},
+        parse_dates=["timestamp"],
     )
+    file_data["vote"] = convert_votes(file_data["vote"])
+
+    return file_data
+
+
+def hash_file(filepath: Path) -> str:
+    """Calculates a hex digest of the contents of the supplied file"""
+
+    file_hash = hashlib.blake2b()
+    with open(filepath, "rb") as hash_input:
+        while chunk := hash_input.read(DOWNLOAD_CHUNK_SIZE):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def read_cache_signature(signature_file: Path) -> Optional[Dict[str, Any]]:
+    """Reads the signature (size, modification time and content hash) of the mbox file
+    that a cache file was created from. Returns None if there is no valid signature."""
+
+    try:
+        with open(signature_file, "r", encoding="utf8") as signature_input:
+            signature: Any = json.load(signature_input)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(signature, dict):
+        return None
+
+    return signature
+
+
+def write_cache_signature(
+    signature_file: Path, mbox_file: Path, mbox_hash: str
+) -> None:
+    """Writes the signature of the mbox file that a cache file was created from"""
+
+    mbox_stat: os.stat_result = mbox_file.stat()
+    with open(signature_file, "w", encoding="utf8") as signature_output:
+        json.dump(
+            {
+                "size": mbox_stat.st_size,
+                "mtime_ns": mbox_stat.st_mtime_ns,
+                "hash": mbox_hash,
+            },
+            signature_output,
+        )
+
+
+def process_mbox_file(
+    mbox_file: Path, cache_dir: Path, overwrite_cache: bool = False
+) -> Optional[DataFrame]:
+    """Process a single mbox file, or load its results from the cache directory if they
+    have already been processed. The cache is only used if the mbox file's contents are
+    unchanged since it was processed. Returns None if the file could not be processed."""
+
+    cache_file: Path = cache_dir.joinpath(mbox_file.name + CACHE_SUFFIX)
+    signature_file: Path = cache_dir.joinpath(
+        mbox_file.name + CACHE_SUFFIX + HASH_SUFFIX
+    )
+    mbox_hash: Optional[str] = None
+
+    signature: Optional[Dict[str, Any]] = None
+    if cache_file.exists() and not overwrite_cache:
+        signature = read_cache_signature(signature_file)
+
+    if signature:
+        # If the size and modification time are unchanged the file hasn't been touched
+        # since it was cached, so there is no need to read it all to hash it.
+        mbox_stat: os.stat_result = mbox_file.stat()
+        if (
+            signature.get("size") == mbox_stat.st_size
+            and signature.get("mtime_ns") == mbox_stat.st_mtime_ns
+        ):
+            LOG.info("Loading data from cache file: %s", cache_file)
+            return load_mbox_cache_file(cache_file)
+
+        # The file has been touched (e.g. re-downloaded) but may have the same contents
+        mbox_hash = hash_file(mbox_file)
+        if signature.get("hash") == mbox_hash:
+            write_cache_signature(signature_file, mbox_file, mbox_hash)
+            LOG.info("Loading data from cache file: %s", cache_file)
+            return load_mbox_cache_file(cache_file)
+
+        LOG.info("Mbox file %s has changed since it was cached", mbox_file.name)
+
+    # Either the cache file doesn't exist, is out of date or we want to overwrite it
+    LOG.info("Processing file: %s", mbox_file.name)
+    try:
+        file_data: DataFrame = process_mbox_archive(mbox_file)
+    except Exception as ex:
+        LOG.error("Error processing file %s: %s", mbox_file.name, ex)
+        return None
+
+    file_data.to_csv(cache_file, index=False)
+    if not mbox_hash:
+        mbox_hash = hash_file(mbox_file)
+    write_cache_signature(signature_file, mbox_file, mbox_hash)
 
     return file_data
 
@@ -388,32 +616,38 @@ def load_mbox_cache_file(cache_file: Path) -> DataFrame:
 def process_mbox_files(
     mbox_files: List[Path], cache_dir: Path, overwrite_cache: bool = False
 ) -> DataFrame:
-    """Process a list of mbox files and cache the results under the provided cache directory"""
-
-    output: DataFrame = DataFrame(columns=KIP_MENTION_COLUMNS)
-
-    for element in mbox_files:
+    """Process a list of mbox files and cache the results under the provided cache directory.
+    Each mbox file is independent so multiple files are processed in parallel."""
+
+    all_file_data: Iterable[Optional[DataFrame]]
+    if len(mbox_files) < 2:
+        all_file_data = [
+            process_mbox_file(element, cache_dir, overwrite_cache)
+            for element in mbox_files
+        ]
+    else:
+        with ProcessPoolExecutor() as executor:
+            all_file_data = list(
+                executor.map(
+                    process_mbox_file,
+                    mbox_files,
+                    repeat(cache_dir),
+                    repeat(overwrite_cache),
+                )
+            )
 
-        cache_file: Path = cache_dir.joinpath(element.name + CACHE_SUFFIX)
-        if cache_file.exists() and not overwrite_cache:
-            print(f"Loading data from cache file: {cache_file}")
-            file_data: DataFrame = load_mbox_cache_file(cache_file)
-        else:
-            # Either the cache file doesn't exist or we want to overwrite it
-            if overwrite_cache:
-                print(f"Processing file: {element.name}")
-            else:
-                print(f"Processing file: {element.name}")
-            try:
-                file_data = process_mbox_archive(element)
-            except Exception as ex:
-                print(f"ERROR processing file {element.name}: {ex}")
-            else:
-                file_data.to_csv(cache_file, index=False)
+    # Concatenate once at the end, rather than growing the output frame file by file,
+    # so each file's rows are only copied a single time.
+    frames: List[DataFrame] = [
+        file_data for file_data in all_file_data if file_data is not None
+    ]
 
-        output = concat((output, file_data), ignore_index=True)
+    if not frames:
+        empty: DataFrame = DataFrame(columns=KIP_MENTION_COLUMNS)
+        empty["mention_type"] = empty["mention_type"].astype(MENTION_TYPE_DTYPE)
+        return empty
 
-    return output
+    return concat(frames, ignore_index=True)
 
 
 def process_all_mbox_in_directory(
@@ -436,36 +670,22 @@ def process_all_mbox_in_directory(
             if "mbox" in element.name:
                 mbox_files.append(element)
             else:
-                print(f"Skipping non-mbox file: {element.name}")
+                LOG.info("Skipping non-mbox file: %s", element.name)
 
     output: DataFrame = process_mbox_files(mbox_files, cache_dir, overwrite_cache)
 
     return output
 
 
-def get_most_recent_mentions(kip_mentions: DataFrame) -> DataFrame:
-    """Gets the most recent mentions, for each metion type, for each kip from
-    the supplied mentions dataframe"""
-
-    output = []
-
-    for _, kip_mention_data in kip_mentions.groupby(["kip", "mention_type"]):
-        output.append(
-            kip_mention_data[
-                kip_mention_data["timestamp"] == kip_mention_data["timestamp"].max()
-            ]
-        )
-
-    return concat(output, ignore_index=True)
-
-
 def get_most_recent_mention_by_type(kip_mentions: DataFrame) -> DataFrame:
     """Gets a dataframe indexed by KIP number with the most recent mention of each mention type."""
 
-    most_recent_kip_mentions: DataFrame = get_most_recent_mentions(kip_mentions)
-
-    most_recent: DataFrame = most_recent_kip_mentions.pivot_table(
-        index="kip", columns="mention_type", values="timestamp"
+    # The most recent mention is the latest timestamp in each kip/mention type group,
+    # so a single grouped max reshaped into columns is all that is needed.
+    most_recent: DataFrame = (
+        kip_mentions.groupby(["kip", "mention_type"], observed=True)["timestamp"]
+        .max()
+        .unstack("mention_type")
     )
     most_recent["overall"] = most_recent.max(axis=1, skipna=True, numeric_only=False)
 
@@ -1,3 +1,5 @@
+import logging
+
 from argparse import ArgumentParser, Namespace
 from pathlib import Path
 from typing import List
@@ -14,12 +16,22 @@ from kipper.mailing_list import (
 from kipper.output import render_standalone_status_page
 from kipper.wiki import get_kip_information, get_kip_main_page_info
 
+LOG: logging.Logger = logging.getLogger(__name__)
+
 
 def create_parser() -> ArgumentParser:
     """Creates the Argument Parser instance for the command line interface."""
 
     parser: ArgumentParser = ArgumentParser("KIPper: The KIP Enrichment Program")
 
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Log detailed progress, including per message and per KIP processing.",
+    )
+
     main_subparser = parser.add_subparsers(title="subcommands", dest="subcommand")
     setup_top_level_commands(main_subparser)
     setup_mail_command(main_subparser)
@@ -144,7 +156,8 @@ def setup_wiki_command(main_subparser):
         "--update",
         required=False,
         action="store_true",
-        help="Update KIP wiki information. This will add any newly added KIPs to the existing cache.",
+        help="Update KIP wiki information. This will add any newly added KIPs to the existing cache "
+        + "and refresh any KIPs whose wiki page has been modified since it was cached.",
     )
 
 
@@ -197,7 +210,7 @@ def process_mail_archives(args: Namespace) -> None:
     )
     output_file: Path = out_dir.joinpath("kip_mentions.csv")
     kip_mentions.to_csv(output_file, index=False)
-    print(f"Saved KIP mentions to {output_file}")
+    LOG.info("Saved KIP mentions to %s", output_file)
 
 
 def setup_wiki_download(args: Namespace) -> None:
@@ -215,12 +228,17 @@ def run():
     parser: ArgumentParser = create_parser()
     args: Namespace = parser.parse_args()
 
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.verbose:
+        # Only turn on debug output for kipper itself, not the HTTP libraries
+        logging.getLogger("kipper").setLevel(logging.DEBUG)
+
     if args.subcommand == "init":
-        print("Initializing all data caches")
-        print("Downloading KIP Wiki Information")
+        LOG.info("Initializing all data caches")
+        LOG.info("Downloading KIP Wiki Information")
         args.overwrite = True
         setup_wiki_download(args)
-        print("Dowloading Developer Mailing List Archives")
+        LOG.info("Dowloading Developer Mailing List Archives")
         args.mailing_list = "dev"
         setup_mail_download(args)
         args.overwrite_cache = True
@@ -228,20 +246,21 @@ def run():
         process_mail_archives(args)
 
     if args.subcommand == "update":
-        print("Updating all data caches")
-        print("Updating KIP Wiki Information")
+        LOG.info("Updating all data caches")
+        LOG.info("Updating KIP Wiki Information")
         args.update = True
         args.overwrite = False
         setup_wiki_download(args)
-        print("Updating Developer Mailing List Archives")
+        LOG.info("Updating Developer Mailing List Archives")
         # Re-download the most recent months archive
         args.days = 1
         args.overwrite = True
         args.mailing_list = "dev"
         updated_files: List[Path] = setup_mail_download(args)
-        # Reprocess just the newly downloaded mail file
+        # Reprocess just the newly downloaded mail file. The cache is checked against
+        # the file's contents so it is only reprocessed if new mail was downloaded.
         cache_dir: Path = Path("dev").joinpath(CACHE_DIR)
-        process_mbox_files(updated_files, cache_dir, overwrite_cache=True)
+        process_mbox_files(updated_files, cache_dir)
         # Overwrite the kip mentions cache by process all the old mbox cache files
         # and the newly overwritten one(s)
         args.directory = "dev"
@@ -1,11 +1,19 @@
 import re
-import math
 import datetime as dt
 
 from typing import List, Dict, Union, Optional, cast
 from enum import Enum
-
-from pandas import DataFrame, Timestamp, Timedelta, to_datetime
+from dataclasses import dataclass
+from functools import lru_cache
+
+from pandas import (
+    DataFrame,
+    Series,
+    CategoricalDtype,
+    Timestamp,
+    Timedelta,
+    to_datetime,
+)
 from jinja2 import Template, Environment, FileSystemLoader
 
 from kipper.mailing_list import get_most_recent_mention_by_type
@@ -17,6 +25,10 @@ from kipper.wiki import (
 )
 
 KIP_SPLITTER: re.Pattern = re.compile(r"KIP-\d+\W?[:-]?\W?", re.IGNORECASE)
+TEMPLATE_DIR: str = "templates"
+OUTPUT_BUFFER_SIZE: int = 1 << 20
+VOTES: List[str] = ["+1", "0", "-1"]
+VOTE_DTYPE: CategoricalDtype = CategoricalDtype(VOTES)
 
 
 class KIPStatus(Enum):
@@ -34,31 +46,62 @@ class KIPStatus(Enum):
         self.duration = duration
 
 
-def calculate_status(last_mention: Timestamp) -> KIPStatus:
-    """Calculates the appropriate KIPStatus instance based on the time
-    difference between now and the last mention."""
-
-    now: Timestamp = to_datetime(dt.datetime.utcnow(), utc=True)
-    diff: Timedelta = now - last_mention
-
-    if diff <= KIPStatus.GREEN.duration:
-        return KIPStatus.GREEN
-
-    if diff <= KIPStatus.YELLOW.duration:
-        return KIPStatus.YELLOW
-
-    if diff <= KIPStatus.RED.duration:
-        return KIPStatus.RED
+@dataclass(slots=True)
+class KIPStatusEntry:
+    """The row of the status table for a single KIP under discussion"""
+
+    id: int
+    text: str
+    url: str
+    created_by: str
+    age: str
+    status: KIPStatus
+    status_color: str
+    plus_one: List[str]
+    zero: List[str]
+    minus_one: List[str]
+
+
+# Statuses in order of increasing time since the last mention. BLACK covers any time
+# beyond the RED duration so it has no upper limit.
+MENTION_STATUSES: List[KIPStatus] = [
+    KIPStatus.GREEN,
+    KIPStatus.YELLOW,
+    KIPStatus.RED,
+    KIPStatus.BLACK,
+]
+
+
+def calculate_statuses(
+    last_mentions: Series, now: Optional[dt.datetime] = None
+) -> Dict[int, KIPStatus]:
+    """Calculates the KIPStatus for every entry in the supplied series of last
+    mention timestamps, indexed by KIP ID, in a single vectorised pass. The current
+    time can be supplied so that it is only read once."""
+
+    if not now:
+        now = Timestamp.now(tz="UTC")
+
+    # For each mention find the first status whose duration is at least the time since
+    # the mention.
+    limits: Series = Series(
+        [status.duration.total_seconds() for status in MENTION_STATUSES[:-1]]
+    )
+    ages: Series = (now - last_mentions).dt.total_seconds()
+    status_indexes = limits.searchsorted(ages.to_numpy(), side="left")
 
-    return KIPStatus.BLACK
+    return {
+        kip_id: MENTION_STATUSES[status_index]
+        for kip_id, status_index in zip(last_mentions.index, status_indexes)
+    }
 
 
 def clean_description(description: str):
     """Cleans the kips description of the KIP-XXX string"""
 
-    kip_match: Optional[re.Match] = re.match(KIP_SPLITTER, description)
+    kip_match: Optional[re.Match] = KIP_SPLITTER.match(description)
     if kip_match:
-        return description[kip_match.span()[1] :].strip()
+        return description[kip_match.end() :].strip()
 
     return description
 
@@ -67,49 +110,50 @@ def create_vote_dict(kip_mentions: DataFrame) -> Dict[int, Dict[str, List[str]]]
     """Creates a dictionary mapping from KIP ID to a dict mapping
     from vote type to list of those who voted that way"""
 
+    votes: DataFrame = kip_mentions.loc[
+        kip_mentions["vote"].notna(), ["kip", "from", "vote"]
+    ]
+    # Grouping on the categorical codes of the three possible votes is cheaper than
+    # hashing the vote strings
+    voters: Series = (
+        votes["from"]
+        .str.replace('"', "", regex=False)
+        .groupby(
+            [votes["kip"], votes["vote"].astype(VOTE_DTYPE)], sort=False, observed=True
+        )
+        .unique()
+    )
+
     vote_dict: Dict[int, Dict[str, List[str]]] = {}
     kip_id: int
-    kip_votes: DataFrame
-    for kip_id, kip_votes in kip_mentions[~kip_mentions["vote"].isna()][
-        ["kip", "from", "vote"]
-    ].groupby("kip"):
-        kip_dict = {}
-        for vote in ["+1", "0", "-1"]:
-            kip_dict[f"{vote}"] = list(
-                set(
-                    name.replace('"', "")
-                    for name in kip_votes[kip_votes["vote"] == vote]["from"]
-                )
-            )
-        vote_dict[kip_id] = kip_dict
+    vote: str
+    for (kip_id, vote), names in voters.items():
+        kip_dict: Dict[str, List[str]] = vote_dict.setdefault(
+            kip_id, {vote_option: [] for vote_option in VOTES}
+        )
+        kip_dict[vote] = names.tolist()
 
     return vote_dict
 
 
-def calculate_age(date_str: str) -> str:
-    """Calculate the age string for the given date string"""
-
-    then: dt.datetime = dt.datetime.strptime(date_str, WIKI_DATE_FORMAT).replace(
-        tzinfo=dt.timezone.utc
-    )
-    now: dt.datetime = dt.datetime.now(dt.timezone.utc)
-    diff: dt.timedelta = now - then
+def format_age(diff: dt.timedelta) -> str:
+    """Creates the age string for the given time difference"""
 
     if diff.days < 7:
         return f"{diff.days} days"
 
     if diff.days > 7 and diff.days < 365:
-        weeks: int = int(round(diff.days / 7, 0))
+        weeks: int = round(diff.days / 7)
         return f"{weeks} weeks"
 
-    years: int = math.floor(diff.days / 365)
-    weeks_remaining: int = int(round(diff.days / 7 % 52, 0))
+    years: int = diff.days // 365
+    weeks_remaining: int = round(diff.days / 7 % 52)
     return f"{years} years {weeks_remaining} weeks"
 
 
 def create_status_dict(
     kip_mentions: DataFrame, kip_wiki_info: Dict[int, Dict[str, Union[int, str]]]
-) -> List[Dict[str, Union[int, str, KIPStatus, List[str]]]]:
+) -> List[KIPStatusEntry]:
     """Calculate a status for each KIP based on how recently it was mentioned in an
     email subject"""
 
@@ -119,43 +163,79 @@ def create_status_dict(
 
     vote_dict: Dict[int, Dict[str, List[str]]] = create_vote_dict(kip_mentions)
 
-    output: List[Dict[str, Union[int, str, KIPStatus, List[str]]]] = []
-    for kip_id in sorted(kip_wiki_info.keys(), reverse=True):
+    now: dt.datetime = dt.datetime.now(dt.timezone.utc)
+
+    mention_statuses: Dict[int, KIPStatus] = calculate_statuses(subject_mentions, now)
+
+    under_discussion: List[int] = sorted(
+        (
+            kip_id
+            for kip_id, kip_data in kip_wiki_info.items()
+            if kip_data["state"] == UNDER_DISCUSSION
+        ),
+        reverse=True,
+    )
+
+    # Parse all the creation dates in one go rather than one KIP at a time
+    created_diffs: Dict[int, dt.timedelta] = (
+        now
+        - to_datetime(
+            Series(
+                [kip_wiki_info[kip_id]["created_on"] for kip_id in under_discussion],
+                index=under_discussion,
+                dtype=object,
+            ),
+            format=WIKI_DATE_FORMAT,
+            utc=True,
+        )
+    ).to_dict()
+
+    output: List[KIPStatusEntry] = []
+    for kip_id in under_discussion:
         kip_data: Dict[str, Union[int, str]] = kip_wiki_info[kip_id]
-        if kip_data["state"] == UNDER_DISCUSSION:
-            status_entry: Dict[str, Union[int, str, KIPStatus, List[str]]] = {}
-            status_entry["id"] = kip_id
-            status_entry["text"] = clean_description(cast(str, kip_data["title"]))
-            status_entry["url"] = kip_data["web_url"]
-            status_entry["created_by"] = kip_data["created_by"]
-            status_entry["age"] = calculate_age(kip_data["created_on"])
-
-            if kip_id in subject_mentions:
-                status_entry["status"] = calculate_status(subject_mentions[kip_id])
-            else:
-                created_diff: dt.timedelta = dt.datetime.now(
-                    dt.timezone.utc
-                ) - dt.datetime.strptime(
-                    cast(str, kip_data["created_on"]), WIKI_DATE_FORMAT
-                ).replace(
-                    tzinfo=dt.timezone.utc
-                )
-                if created_diff <= dt.timedelta(days=28):
-                    status_entry["status"] = KIPStatus.BLUE
-                else:
-                    status_entry["status"] = KIPStatus.BLACK
-
-            for vote in ["+1", "0", "-1"]:
-                if kip_id in vote_dict:
-                    status_entry[vote] = vote_dict[kip_id][vote]
-                else:
-                    status_entry[vote] = []
-
-            output.append(status_entry)
+        created_diff: dt.timedelta = created_diffs[kip_id]
+
+        status: KIPStatus
+        if kip_id in mention_statuses:
+            status = mention_statuses[kip_id]
+        elif created_diff <= dt.timedelta(days=28):
+            status = KIPStatus.BLUE
+        else:
+            status = KIPStatus.BLACK
+
+        kip_votes: Dict[str, List[str]] = vote_dict.get(kip_id, {})
+
+        output.append(
+            KIPStatusEntry(
+                id=kip_id,
+                text=clean_description(cast(str, kip_data["title"])),
+                url=cast(str, kip_data["web_url"]),
+                created_by=cast(str, kip_data["created_by"]),
+                age=format_age(created_diff),
+                status=status,
+                # Pass the colour as a plain string so the template doesn't look it
+                # up per row
+                status_color=status.text,
+                plus_one=kip_votes.get("+1", []),
+                zero=kip_votes.get("0", []),
+                minus_one=kip_votes.get("-1", []),
+            )
+        )
 
     return output
 
 
+@lru_cache(maxsize=None)
+def get_template(template_name: str) -> Template:
+    """Loads and compiles the named template from the templates directory. Compiling
+    a template is much more expensive than rendering it, so each one is only compiled
+    once per process."""
+
+    return Environment(loader=FileSystemLoader(TEMPLATE_DIR)).get_template(
+        template_name
+    )
+
+
 def render_standalone_status_page(
     kip_mentions: DataFrame,
     output_filename: str,
@@ -166,19 +246,17 @@ def render_standalone_status_page(
     kip_main_info = get_kip_main_page_info()
     kip_wiki_info = get_kip_information(kip_main_info)
 
-    kip_status: List[
-        Dict[str, Union[int, str, KIPStatus, List[str]]]
-    ] = create_status_dict(kip_mentions, kip_wiki_info)
+    kip_status: List[KIPStatusEntry] = create_status_dict(kip_mentions, kip_wiki_info)
 
-    template: Template = Environment(loader=FileSystemLoader("templates")).get_template(
-        "index.html.jinja"
-    )
-
-    output: str = template.render(
-        kip_status=kip_status,
-        kip_status_enum=KIPStatus,
-        date=dt.datetime.now(dt.timezone.utc).strftime("%Y/%m/%d %H:%M:%S %Z"),
-    )
+    template: Template = get_template("index.html.jinja")
 
-    with open(output_filename, "w", encoding="utf8") as out_file:
-        out_file.write(output)
+    # Write the page out as it is rendered rather than building it all as one string.
+    # Jinja yields many small chunks, so a large buffer keeps the number of writes low.
+    with open(
+        output_filename, "w", encoding="utf8", buffering=OUTPUT_BUFFER_SIZE
+    ) as out_file:
+        template.stream(
+            kip_status=kip_status,
+            status_key=[(status.text, status.duration.days) for status in KIPStatus],
+            date=dt.datetime.now(dt.timezone.utc).strftime("%Y/%m/%d %H:%M:%S %Z"),
+        ).dump(out_file)
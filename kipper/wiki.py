@@ -1,24 +1,67 @@
 import re
 import json
-from typing import Any, List, Dict, Optional, Union, cast
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Iterable, List, Dict, Optional, Union, cast
 from pathlib import Path
 
 import requests
 
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from bs4 import BeautifulSoup, SoupStrainer
 from bs4.element import Tag
 
+LOG: logging.Logger = logging.getLogger(__name__)
+
 BASE_URL: str = "https://wiki.apache.org/confluence"
 CONTENT_URL: str = BASE_URL + "/rest/api/content"
 WIKI_DATE_FORMAT: str = "%Y-%m-%dT%H:%M:%S.000Z"
 
-KIP_PATTERN: re.Pattern = re.compile("KIP-(?P<kip>\d+)", re.IGNORECASE)
+KIP_PATTERN: re.Pattern = re.compile(r"KIP-(?P<kip>\d+)", re.IGNORECASE | re.ASCII)
+
+# Only the paragraphs of a KIP page and the tables of the main page are ever read, so
+# the parser is restricted to building those elements rather than the whole page.
+PARAGRAPH_STRAINER: SoupStrainer = SoupStrainer("p")
+TABLE_STRAINER: SoupStrainer = SoupStrainer("table")
+
+# Start KIP parsing workers from a fork server where the platform supports one (not
+# Windows), otherwise use the platform's default start method.
+WORKER_START_METHOD: Optional[str] = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+)
+
+
+def create_session() -> requests.Session:
+    """Creates a requests session which keeps connections to the wiki alive between
+    calls and retries requests which fail with a server error"""
+
+    session: requests.Session = requests.Session()
+    adapter: HTTPAdapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        # Confluence rate limits long crawls, so also back off and retry on 429 rather
+        # than losing everything not yet cached. Retry honours any Retry-After header.
+        max_retries=Retry(
+            total=5, backoff_factor=1.0, status_forcelist=[429, 500, 502, 503, 504]
+        ),
+    )
+    session.mount("https://", adapter)
+
+    return session
+
 
+SESSION: requests.Session = create_session()
 
+
+@lru_cache(maxsize=1)
 def get_kip_main_page_info() -> Dict[str, Any]:
-    """Gets the details of the main KIP page"""
+    """Gets the details of the main KIP page. The details only identify the page and
+    its children, so they are only requested once per process."""
 
-    kip_request: requests.Response = requests.get(
+    kip_request: requests.Response = SESSION.get(
         CONTENT_URL,
         params={
             "type": "page",
@@ -43,13 +86,21 @@ def get_kip_main_page_info() -> Dict[str, Any]:
 def get_kip_main_page_body(kip_main_info: Dict[str, Any]) -> str:
     """Gets the RAW HTML body of the KIP main page"""
 
-    kip_body_request: requests.Response = requests.get(
-        CONTENT_URL + "/" + kip_main_info["id"], params={"expand": "body.view"}
+    return get_page_body(kip_main_info["id"])
+
+
+@lru_cache(maxsize=1)
+def get_page_body(page_id: str) -> str:
+    """Gets the RAW HTML body of the wiki page with the supplied ID. The main page
+    body is large, so it is only requested once per process."""
+
+    page_body_request: requests.Response = SESSION.get(
+        CONTENT_URL + "/" + page_id, params={"expand": "body.view"}
     )
 
-    kip_body_request.raise_for_status()
+    page_body_request.raise_for_status()
 
-    return kip_body_request.json()["body"]["view"]["value"]
+    return page_body_request.json()["body"]["view"]["value"]
 
 
 ACCEPTED_TERMS: List[str] = [
@@ -92,16 +143,27 @@ NOT_ACCEPTED: str = "not accepted"
 UNKNOWN: str = "unknown"
 
 
+def create_terms_pattern(terms: List[str]) -> re.Pattern:
+    """Creates a case insensitive pattern which matches any of the supplied terms"""
+
+    return re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+
+
+ACCEPTED_PATTERN: re.Pattern = create_terms_pattern(ACCEPTED_TERMS)
+UNDER_DISCUSSION_PATTERN: re.Pattern = create_terms_pattern(UNDER_DISCUSSION_TERMS)
+NOT_ACCEPTED_PATTERN: re.Pattern = create_terms_pattern(NOT_ACCEPTED_TERMS)
+
+
 def get_current_state(html: str) -> Optional[str]:
     """Discerns the state of the kip from the supplied current state html paragraph"""
 
-    if any(option in html.lower() for option in ACCEPTED_TERMS):
+    if ACCEPTED_PATTERN.search(html):
         return ACCEPTED
 
-    if any(option in html.lower() for option in UNDER_DISCUSSION_TERMS):
+    if UNDER_DISCUSSION_PATTERN.search(html):
         return UNDER_DISCUSSION
 
-    if any(option in html.lower() for option in NOT_ACCEPTED_TERMS):
+    if NOT_ACCEPTED_PATTERN.search(html):
         return NOT_ACCEPTED
 
     return None
@@ -112,25 +174,34 @@ def enrich_kip_info(body_html: str, kip_dict: Dict[str, Union[str, int]]) -> Non
     key in the supplied dictionary. It will add the derived data to the
     supplied dict."""
 
-    parsed_body: BeautifulSoup = BeautifulSoup(body_html, "html.parser")
+    # KIP pages often put the state or JIRA link in a block element inside the
+    # paragraph. lxml would close the paragraph at that element, separating it from
+    # its label, whereas html.parser keeps it nested inside the paragraph.
+    parsed_body: BeautifulSoup = BeautifulSoup(
+        body_html, "html.parser", parse_only=PARAGRAPH_STRAINER
+    )
 
     state_processed: bool = False
     jira_processed: bool = False
 
     for para in parsed_body.find_all("p"):
 
-        if not state_processed and "current state" in para.text.lower():
-            state: Optional[str] = get_current_state(para.text)
+        # Flattening a tag's text walks all of its descendants so only do it once
+        para_text: str = para.get_text()
+        para_text_lower: str = para_text.lower()
+
+        if not state_processed and "current state" in para_text_lower:
+            state: Optional[str] = get_current_state(para_text)
             if state:
                 kip_dict["state"] = state
             else:
-                print(f"Could not discern KIP state from {para}")
+                LOG.warning("Could not discern KIP state from %s", para)
                 kip_dict["state"] = UNKNOWN
 
             state_processed = True
 
-        elif not jira_processed and "jira" in para.text.lower():
-            link: Tag = para.find("a")
+        elif not jira_processed and "jira" in para_text_lower:
+            link: Optional[Tag] = para.find("a")
             if link:
                 href: Optional[str] = link.get("href")
             else:
@@ -139,11 +210,14 @@ def enrich_kip_info(body_html: str, kip_dict: Dict[str, Union[str, int]]) -> Non
             if href:
                 kip_dict["jira"] = href
             else:
-                print(f"Could not discern JIRA link from {para}")
+                LOG.warning("Could not discern JIRA link from %s", para)
                 kip_dict["jira"] = UNKNOWN
 
             jira_processed = True
 
+        if state_processed and jira_processed:
+            break
+
     if not state_processed:
         kip_dict["state"] = UNKNOWN
 
@@ -154,23 +228,36 @@ def enrich_kip_info(body_html: str, kip_dict: Dict[str, Union[str, int]]) -> Non
 def process_child_kip(kip_id: int, child: dict):
     """Process and enrich the KIP child page dictionary"""
 
-    print(f"Processing KIP {kip_id} wiki page")
+    links: Dict[str, str] = child["_links"]
+    history: Dict[str, Any] = child["history"]
+    last_updated: Dict[str, Any] = history["lastUpdated"]
+
     child_dict: Dict[str, Union[int, str]] = {}
     child_dict["kip_id"] = kip_id
     child_dict["title"] = child["title"]
-    child_dict["web_url"] = BASE_URL + child["_links"]["webui"]
-    child_dict["content_url"] = child["_links"]["self"]
-    child_dict["created_on"] = child["history"]["createdDate"]
-    child_dict["created_by"] = child["history"]["createdBy"]["displayName"]
-    child_dict["last_modified_on"] = child["history"]["lastUpdated"]["when"]
-    child_dict["last_modified_by"] = child["history"]["lastUpdated"]["by"][
-        "displayName"
-    ]
+    child_dict["web_url"] = BASE_URL + links["webui"]
+    child_dict["content_url"] = links["self"]
+    child_dict["created_on"] = history["createdDate"]
+    child_dict["created_by"] = history["createdBy"]["displayName"]
+    child_dict["last_modified_on"] = last_updated["when"]
+    child_dict["last_modified_by"] = last_updated["by"]["displayName"]
     enrich_kip_info(child["body"]["view"]["value"], child_dict)
 
     return child_dict
 
 
+def get_kip_child_page(
+    url: str, params: Optional[Dict[str, Union[str, int]]] = None
+) -> Dict[str, Any]:
+    """Gets a single page of results from the KIP child pages listing"""
+
+    kip_child_request: requests.Response = SESSION.get(url, params=params)
+
+    kip_child_request.raise_for_status()
+
+    return kip_child_request.json()
+
+
 def get_kip_information(
     kip_main_info: Dict[str, Any],
     chunk: int = 100,
@@ -186,7 +273,7 @@ def get_kip_information(
 
     cache_file_path: Path = Path(cache_filepath)
     if cache_file_path.exists() and not overwrite_cache:
-        print(f"Loading KIP Wiki information from cache file: {cache_file_path}")
+        LOG.info("Loading KIP Wiki information from cache file: %s", cache_file_path)
         with open(cache_file_path, "r", encoding="utf8") as cache_file:
             output: Dict[int, Dict[str, Union[int, str]]] = {
                 int(k): v for k, v in json.load(cache_file).items()
@@ -197,45 +284,80 @@ def get_kip_information(
         output = {}
 
     if cache_file_path.exists() and update:
-        print("Updating KIP Wiki information with new KIPs")
+        LOG.info("Updating KIP Wiki information with new and modified KIPs")
     else:
-        print("Downloading KIP Wiki information for all KIPS")
+        LOG.info("Downloading KIP Wiki information for all KIPS")
 
-    kip_child_info_request: requests.Response = requests.get(
+    kip_child_info_request: requests.Response = SESSION.get(
         BASE_URL + kip_main_info["_expandable"]["children"]
     )
 
     kip_child_info_request.raise_for_status()
 
-    first_kip_child_request: requests.Response = requests.get(
+    response_json: Dict[str, Any] = get_kip_child_page(
         BASE_URL + kip_child_info_request.json()["_expandable"]["page"],
         params={"limit": chunk, "expand": "history.lastUpdated,body.view"},
     )
+    more_results: bool = True
 
-    first_kip_child_request.raise_for_status()
+    # Processing a page of children is CPU bound, so download the next page in the
+    # background while the current one is being parsed. Each KIP page is independent
+    # so the pages are parsed in parallel across processes. The prefetch thread is
+    # already using the session when the workers start, so where possible they are
+    # started from a fork server rather than by forking this multi-threaded process.
+    # Workers are only started once a page has more than one KIP to parse.
+    with ThreadPoolExecutor(max_workers=1) as executor, ProcessPoolExecutor(
+        mp_context=multiprocessing.get_context(WORKER_START_METHOD)
+    ) as pool:
+        while more_results:
+
+            next_page: Optional[Future] = None
+            if "next" in response_json["_links"]:
+                next_page = executor.submit(
+                    get_kip_child_page, BASE_URL + response_json["_links"]["next"]
+                )
+
+            kip_ids: List[int] = []
+            children: List[Dict[str, Any]] = []
+            for child in response_json["results"]:
+                kip_match: Optional[re.Match] = KIP_PATTERN.search(child["title"])
+                if not kip_match:
+                    continue
+
+                kip_id: int = int(kip_match.group("kip"))
+                if kip_id in kip_ids:
+                    # The first page found for a KIP number is the one that is kept
+                    continue
+
+                # Only (re)process KIPs which are new or whose wiki page has been
+                # modified since it was cached. If another page shares the KIP number
+                # of a cached one then the cached page is kept.
+                cached: Optional[Dict[str, Union[int, str]]] = output.get(kip_id)
+                if cached is None or (
+                    cached["content_url"] == child["_links"]["self"]
+                    and cached["last_modified_on"]
+                    != child["history"]["lastUpdated"]["when"]
+                ):
+                    LOG.debug("Processing KIP %d wiki page", kip_id)
+                    kip_ids.append(kip_id)
+                    children.append(child)
+
+            child_dicts: Iterable[Dict[str, Union[int, str]]]
+            if len(children) < 2:
+                child_dicts = map(process_child_kip, kip_ids, children)
+            else:
+                child_dicts = pool.map(
+                    process_child_kip, kip_ids, children, chunksize=16
+                )
 
-    response_json = first_kip_child_request.json()
-    more_results: bool = True
+            for kip_id, child_dict in zip(kip_ids, child_dicts):
+                output[kip_id] = child_dict
 
-    while more_results:
-
-        for child in response_json["results"]:
-            kip_match: Optional[re.Match] = re.search(KIP_PATTERN, child["title"])
-            if kip_match:
-                kip_id: int = int(kip_match.groupdict()["kip"])
-                if kip_id not in output:
-                    output[kip_id] = process_child_kip(kip_id, child)
-                # TODO: Add check of last modified versus the stored one to indicate an update is needed.
-
-        if "next" in response_json["_links"]:
-            kip_child_response: requests.Response = requests.get(
-                BASE_URL + response_json["_links"]["next"]
-            )
-            kip_child_response.raise_for_status()
-            response_json = kip_child_response.json()
-            more_results = True
-        else:
-            more_results = False
+            if next_page:
+                response_json = next_page.result()
+                more_results = True
+            else:
+                more_results = False
 
     with open(cache_file_path, "w", encoding="utf8") as cache_file:
         json.dump(output, cache_file)
@@ -253,7 +375,9 @@ def get_kip_tables(kip_main_info: Dict[str, Any]) -> Dict[str, Tag]:
         discarded, recordings] to the Table element."""
 
     body_html: str = get_kip_main_page_body(kip_main_info)
-    parsed_body: BeautifulSoup = BeautifulSoup(body_html, "html.parser")
+    parsed_body: BeautifulSoup = BeautifulSoup(
+        body_html, "lxml", parse_only=TABLE_STRAINER
+    )
 
     tables: List[Tag] = list(parsed_body.find_all("table"))
 
@@ -282,10 +406,10 @@ def process_discussion_table(
         columns: List[Tag] = row.find_all("td")
 
         kip_text: str = columns[0].a.text
-        kip_match: Optional[re.Match] = re.search(KIP_PATTERN, kip_text)
+        kip_match: Optional[re.Match] = KIP_PATTERN.search(kip_text)
 
         if kip_match:
-            kip_id: int = int(kip_match.groupdict()["kip"])
+            kip_id: int = int(kip_match.group("kip"))
             kip_dict["text"] = kip_text
             kip_dict["comment"] = columns[1].text
             try:
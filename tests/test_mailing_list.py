@@ -0,0 +1,93 @@
+import datetime as dt
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from kipper.mailing_list import parse_message_timestamp, process_mbox_archive
+
+NON_ASCII_DATE_MBOX: bytes = (
+    b"From alice@example.com Tue Mar  1 10:00:00 2022\n"
+    b"From: Alice <alice@example.com>\n"
+    b"Subject: [DISCUSS] KIP-123: Something\n"
+    b"Message-ID: <1@example.com>\n"
+    b"Date: Tue, 1 Mar 2022 10:00:00 +0100 (Mitteleurop\xc3\xa4ische Zeit)\n"
+    b"\n"
+    b"Some thoughts on this KIP.\n"
+    b"\n"
+    b"From bob@example.com Tue Mar  1 11:00:00 2022\n"
+    b"From: Bob <bob@example.com>\n"
+    b"Subject: Re: [DISCUSS] KIP-123: Something\n"
+    b"Message-ID: <2@example.com>\n"
+    b"Date: Tue, 1 Mar 2022 11:00:00 +0000\n"
+    b"\n"
+    b"Some more thoughts on this KIP.\n"
+)
+
+NON_ASCII_SUBJECT_MBOX: bytes = (
+    b"From alice@example.com Tue Mar  1 10:00:00 2022\n"
+    b"From: Alice <alice@example.com>\n"
+    b"Subject: [VOTE] KIP-123: Gr\xc3\xb6\xc3\x9fere Batches\n"
+    b"Message-ID: <1@example.com>\n"
+    b"Date: Tue, 1 Mar 2022 10:00:00 +0000\n"
+    b"\n"
+    b"Thanks for the KIP, +1 (binding)\n"
+)
+
+
+def process_mbox_bytes(mbox_bytes: bytes):
+    """Writes the supplied bytes to a temporary mbox archive and processes it"""
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        mbox_path: Path = Path(temp_dir).joinpath("dev-2022-03.mbox")
+        mbox_path.write_bytes(mbox_bytes)
+
+        return process_mbox_archive(mbox_path)
+
+
+class TestParseMessageTimestamp(unittest.TestCase):
+    def test_missing_header(self):
+        self.assertIsNone(parse_message_timestamp(None))
+
+    def test_zone_comment(self):
+        self.assertEqual(
+            parse_message_timestamp("Tue, 1 Mar 2022 10:00:00 +0100 (CET)"),
+            dt.datetime(2022, 3, 1, 9, tzinfo=dt.timezone.utc),
+        )
+
+    def test_named_zone_offset(self):
+        self.assertEqual(
+            parse_message_timestamp("Tue, 1 Mar 2022 10:00:00 GMT+01:00"),
+            dt.datetime(2022, 3, 1, 9, tzinfo=dt.timezone.utc),
+        )
+
+
+class TestProcessMboxArchive(unittest.TestCase):
+    def test_non_ascii_date_header(self):
+        """A Date header with non-ASCII bytes is returned as an unhashable Header
+        instance, which must not stop the rest of the archive being processed"""
+
+        mentions = process_mbox_bytes(NON_ASCII_DATE_MBOX)
+
+        subject_mentions = mentions[mentions["mention_type"] == "subject"]
+        self.assertEqual(len(subject_mentions), 2)
+        self.assertEqual(
+            subject_mentions["timestamp"].min(),
+            dt.datetime(2022, 3, 1, 9, tzinfo=dt.timezone.utc),
+        )
+
+    def test_non_ascii_subject_header(self):
+        """A Subject header with non-ASCII bytes is returned as a Header instance,
+        which must still be searched for KIP references"""
+
+        mentions = process_mbox_bytes(NON_ASCII_SUBJECT_MBOX)
+
+        self.assertEqual(
+            sorted(mentions["mention_type"].astype(str)), ["subject", "vote"]
+        )
+        self.assertEqual(mentions["kip"].tolist(), [123, 123])
+        self.assertEqual(mentions["vote"].dropna().tolist(), ["+1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from typing import Dict, Union
+
+from kipper.wiki import ACCEPTED, UNKNOWN, enrich_kip_info
+
+
+def enrich(body_html: str) -> Dict[str, Union[str, int]]:
+    """Runs enrich_kip_info over the supplied page body and returns the derived data"""
+
+    kip_dict: Dict[str, Union[str, int]] = {}
+    enrich_kip_info(body_html, kip_dict)
+    return kip_dict
+
+
+class TestEnrichKIPInfo(unittest.TestCase):
+    def test_inline_state_and_jira(self):
+        kip_dict = enrich(
+            '<p>Current state: <b>Accepted</b></p><p>JIRA: <a href="j1">KAFKA-1</a></p>'
+        )
+        self.assertEqual(kip_dict["state"], ACCEPTED)
+        self.assertEqual(kip_dict["jira"], "j1")
+
+    def test_state_in_block_element(self):
+        kip_dict = enrich("<p>Current state: <div>Accepted</div></p>")
+        self.assertEqual(kip_dict["state"], ACCEPTED)
+
+    def test_jira_in_block_element(self):
+        kip_dict = enrich('<p>JIRA: <div><a href="j1">KAFKA-1</a></div></p>')
+        self.assertEqual(kip_dict["jira"], "j1")
+
+    def test_jira_without_link_followed_by_contents(self):
+        kip_dict = enrich(
+            "<p>JIRA: TBD</p>"
+            '<div class="toc"><ul><li><a href="#Motivation">Motivation</a></li></ul></div>'
+        )
+        self.assertEqual(kip_dict["jira"], UNKNOWN)
+
+
+if __name__ == "__main__":
+    unittest.main()